@@ -6,6 +6,7 @@ extracts dominant colors, and clusters the colors.
 from .segmentation import FaceSegmentation
 from .color_extraction import ColorExtractor
 from .color_clusterer import ColorClusterer
+from .parallel_clustering import extract_dominant_colors
 
 class Clustering:
     """
@@ -13,27 +14,54 @@ class Clustering:
     and cluster the colors.
     """
 
-    def execute(self, images):
+    def __init__(self, workers=0, shard_size=None):
+        """
+        Initializes the Clustering.
+
+        Args:
+            workers (int): Number of worker processes extracting the dominant colors.
+                           With 0 or 1 the images are processed in the server process.
+            shard_size (int): Number of images sent to a worker at a time, by default
+                              about four shards per worker.
+        """
+        self._workers = workers
+        self._shard_size = shard_size
+
+    def execute(self, images, deadline=None):
         """
         Executes the clustering process on the provided images.
 
         Args:
             images (list): A list of images to be processed.
+            deadline (Deadline): Optional deadline. When it expires, the final clustering
+                                 runs on the images processed so far.
 
         Returns:
             dict or bool: Returns the clustering result as a dictionary if successful, 
                           otherwise returns False if segments are not found.
         """
-        # Initialize and process the images for facial segmentation
-        face_segmentation = FaceSegmentation(images)
-        segments = face_segmentation.process_images()
+        if self._workers > 1:
+            # Detection, segmentation and color extraction of each shard in a worker
+            face_count, dominant_colors = extract_dominant_colors(images, self._workers,
+                                                                  self._shard_size, deadline)
+            if face_count < 12 or not dominant_colors:
+                return False
+        else:
+            # Initialize and process the images for facial segmentation
+            face_segmentation = FaceSegmentation(images)
+            segments = face_segmentation.process_images(deadline)
 
-        if not segments:
-            return False
+            if not segments:
+                return False
 
-        # Initialize and extract the dominant colors from the facial segments
-        color_extractor = ColorExtractor(images)
-        dominant_colors = color_extractor.extract_dominant_colors(segments)
+            # Initialize and extract the dominant colors from the facial segments
+            color_extractor = ColorExtractor(images)
+            dominant_colors = color_extractor.extract_dominant_colors(segments,
+                                                                      deadline=deadline)
+
+        # A stopped job may not have enough images left for the 12 clusters
+        if deadline is not None and deadline.reason is not None and len(dominant_colors) < 12:
+            return False
 
         # Initialize and cluster the dominant colors
         color_clusterer = ColorClusterer()
@@ -7,6 +7,7 @@ import pandas as pd
 import numpy as np
 import torch
 from sklearn.cluster import KMeans
+from utils.profiling import profile_region
 
 class ColorClusterer:
     """
@@ -68,7 +69,8 @@ class ColorClusterer:
         df = pd.DataFrame(flattened_faces)
 
         kmeans = KMeans(n_clusters=12, random_state=42)
-        labels = kmeans.fit_predict(df)
+        with profile_region('color_clustering'):
+            labels = kmeans.fit_predict(df)
 
         # Initialize an empty dictionary for clusters
         cluster_dict = {}
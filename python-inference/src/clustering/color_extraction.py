@@ -2,6 +2,7 @@ import PIL
 import numpy as np
 import torch
 from sklearn.cluster import KMeans
+from utils.profiling import profile_region
 
 class ColorExtractor:
     """
@@ -18,13 +19,15 @@ class ColorExtractor:
         self._images = images
         self._device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-    def extract_dominant_colors(self, all_segments, normalize=True):
+    def extract_dominant_colors(self, all_segments, normalize=True, deadline=None):
         """
         Extracts dominant colors from all segments of the images.
 
         Args:
             all_segments (dict): A dictionary containing image segments.
             normalize (bool): Flag to normalize colors. Default is True.
+            deadline (Deadline): Optional deadline, checked before each image. When it expires,
+                                 the colors extracted so far are returned.
 
         Returns:
             dict: A dictionary with dominant colors for each segment.
@@ -32,6 +35,9 @@ class ColorExtractor:
         dominant_colors = {}
 
         for filename, segments in all_segments.items():
+            if deadline is not None and deadline.expired():
+                break
+
             image_tensor = self._load_image(segments[0])
             for face_id, segment_list in segments[1].items():
                 for mask, label_name in segment_list:
@@ -107,7 +113,8 @@ class ColorExtractor:
             return dominant_colors
 
         if segmented_colors.size > 0:
-            kmeans = KMeans(n_clusters=3).fit(segmented_colors)
+            with profile_region('color_kmeans'):
+                kmeans = KMeans(n_clusters=3, random_state=42).fit(segmented_colors)
             centroids = kmeans.cluster_centers_
 
             closest_colors = []
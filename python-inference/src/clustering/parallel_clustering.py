@@ -0,0 +1,166 @@
+"""
+This module provides the parallel extraction of dominant colors used by the Clustering class.
+The images are split in contiguous shards, processed by a pool of worker processes that
+each hold their own face detector and parser, and the per-image colors are gathered in
+the original order, so the result does not depend on the number of shards.
+"""
+
+import logging
+import math
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import torch
+from utils.cancellation import Deadline
+from utils.process_pool import WorkerPool
+from .segmentation import FaceSegmentation
+from .color_extraction import ColorExtractor
+
+logging.basicConfig(level=logging.INFO)
+
+# Interval in seconds at which the deadline is checked while waiting for a shard
+DEADLINE_POLL_INTERVAL = 0.5
+
+# Models held by each worker process
+_face_detector = None
+_face_parser = None
+
+
+def _init_worker(workers):
+    """
+    Initializes a worker process, sharing the cores between the workers and loading its
+    face detector and parser once.
+
+    Args:
+        workers (int): The number of worker processes of the pool.
+    """
+    global _face_detector, _face_parser  # pylint: disable=global-statement
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    _face_detector = FaceSegmentation.build_face_detector(device)
+    _face_parser = FaceSegmentation.build_face_parser(device)
+
+
+def _process_shard(images, expires_at=None, cancel_event=None):
+    """
+    Detects, segments and extracts the dominant colors of a shard of images.
+    The expiry and the cancel event are checked before each image, so a shard of an
+    abandoned request stops early.
+
+    Args:
+        images (list): A list of [name, image] pairs.
+        expires_at (float or None): Absolute time.monotonic() expiry of the request.
+        cancel_event (multiprocessing.Event or None): Event set when the request stops,
+                                                      e.g. because its client disconnected.
+
+    Returns:
+        tuple: A tuple containing the number of detected faces and the normalized
+               dominant colors of each image.
+    """
+    deadline = Deadline(expires_at=expires_at, cancel_event=cancel_event)
+
+    face_segmentation = FaceSegmentation(images, _face_detector, _face_parser)
+    all_faces = face_segmentation.detect(deadline)
+    segments = face_segmentation.segment(all_faces, deadline)
+
+    color_extractor = ColorExtractor(images)
+    return len(all_faces), color_extractor.extract_dominant_colors(segments, deadline=deadline)
+
+
+_pool = WorkerPool(_init_worker)
+
+
+def _wait(future, deadline):
+    """
+    Waits for the result of a shard, checking the deadline periodically.
+
+    Args:
+        future (concurrent.futures.Future): The pending shard.
+        deadline (Deadline): Optional deadline.
+
+    Returns:
+        tuple or None: The result of the shard, or None if the deadline expired first.
+    """
+    while True:
+        try:
+            return future.result(timeout=DEADLINE_POLL_INTERVAL)
+        except FutureTimeoutError:
+            if deadline is not None and deadline.expired():
+                return None
+
+
+def _decoded_images(images):
+    """
+    Decodes the images in the server process, so that they can be pickled for the workers.
+    Images that cannot be decoded, e.g. truncated files, are skipped like in serial mode.
+
+    Args:
+        images (list): A list of [name, image] pairs.
+
+    Returns:
+        list: A list of [name, image] pairs with loaded RGB images.
+    """
+    decoded = []
+    for name, image in images:
+        try:
+            decoded.append([name, image.convert('RGB')])
+        except Exception as e:
+            logging.error("Error while decoding %s: %s", name, e)
+    return decoded
+
+
+def extract_dominant_colors(images, workers, shard_size=None, deadline=None):
+    """
+    Extracts the dominant colors of the images using a pool of worker processes.
+
+    Args:
+        images (list): A list of [name, image] pairs.
+        workers (int): The number of worker processes.
+        shard_size (int): Number of images per shard. By default the images are split in
+                          about four shards per worker, to balance uneven shards.
+        deadline (Deadline): Optional deadline. When it expires, the pending shards are
+                             cancelled and the colors gathered so far are returned. Its time
+                             budget and a cancel event, set when it expires for any reason,
+                             are passed to the shards, so the running ones stop too.
+
+    Returns:
+        tuple: A tuple containing the number of detected faces and the normalized dominant
+               colors of each image, in the order of the images.
+    """
+    images = _decoded_images(images)
+    if not shard_size:
+        shard_size = max(1, math.ceil(len(images) / (workers * 4)))
+
+    expires_at = deadline.expires_at if deadline is not None else None
+    cancel_event = _pool.create_event() if deadline is not None else None
+
+    pool = _pool.get(workers)
+    futures = [pool.submit(_process_shard, images[start:start + shard_size], expires_at,
+                           cancel_event)
+               for start in range(0, len(images), shard_size)]
+
+    face_count = 0
+    dominant_colors = {}
+    for index, future in enumerate(futures):
+        try:
+            result = _wait(future, deadline)
+        except Exception as e:
+            if cancel_event is not None:
+                cancel_event.set()
+            if isinstance(e, BrokenProcessPool):
+                # A worker died, the pool is rebuilt on the next request
+                _pool.reset(pool)
+            raise
+
+        if result is None:
+            cancel_event.set()
+            for pending in futures[index:]:
+                pending.cancel()
+            break
+
+        shard_face_count, shard_colors = result
+        face_count += shard_face_count
+        dominant_colors.update(shard_colors)
+
+    return face_count, dominant_colors
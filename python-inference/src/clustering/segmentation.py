@@ -8,6 +8,7 @@ import PIL
 import numpy as np
 import torch
 import facer
+from utils.profiling import profile_region
 
 logging.basicConfig(level=logging.INFO)
 
@@ -16,31 +17,83 @@ class FaceSegmentation:
     FaceSegmentation class to detect and segment faces in provided images.
     """
 
-    def __init__(self, images):
+    def __init__(self, images, face_detector=None, face_parser=None):
         """
         Initializes the FaceSegmentation with images and sets up the device and facial detectors.
 
         Args:
             images (list): A list of images to process.
+            face_detector (torch.nn.Module): Optional face detector to reuse, built if missing.
+            face_parser (torch.nn.Module): Optional face parser to reuse, built if missing.
         """
         self._images = images
         self._device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self._face_detector = facer.face_detector('retinaface/mobilenet', device=self._device)
-        self._face_parser = facer.face_parser('farl/lapa/448', device=self._device)
+        self._face_detector = face_detector or FaceSegmentation.build_face_detector(self._device)
+        self._face_parser = face_parser or FaceSegmentation.build_face_parser(self._device)
 
-    def process_images(self):
+    @staticmethod
+    def build_face_detector(device):
+        """
+        Builds the face detector.
+
+        Args:
+            device (torch.device): The device on which the detector runs.
+
+        Returns:
+            torch.nn.Module: The face detector.
+        """
+        return facer.face_detector('retinaface/mobilenet', device=device)
+
+    @staticmethod
+    def build_face_parser(device):
+        """
+        Builds the face parser.
+
+        Args:
+            device (torch.device): The device on which the parser runs.
+
+        Returns:
+            torch.nn.Module: The face parser.
+        """
+        return facer.face_parser('farl/lapa/448', device=device)
+
+    def process_images(self, deadline=None):
         """
         Processes the images for facial detection and segmentation.
 
+        Args:
+            deadline (Deadline): Optional deadline, checked before each image. When it expires,
+                                 the images processed so far are used.
+
         Returns:
             dict: A dictionary containing the segmented faces and their components.
         """
+        all_faces = self.detect(deadline)
+
+        if len(all_faces) < 12:
+            return False
+
+        return self.segment(all_faces, deadline)
+
+    def detect(self, deadline=None):
+        """
+        Detects the faces in the images. Images with several faces are replaced by
+        one image per face, which is detected again.
+
+        Args:
+            deadline (Deadline): Optional deadline, checked before each image.
+
+        Returns:
+            dict: A dictionary mapping image names to (image, faces) tuples.
+        """
         all_faces = {}
-        all_segments = {}
         index = 0
 
         # Phase 1: Detection
         while index < len(self._images):
+            if deadline is not None and deadline.expired():
+                break
+
             image = self._images[index]
 
             try:
@@ -58,11 +111,25 @@ class FaceSegmentation:
 
             index += 1
 
-        if len(all_faces) < 12:
-            return False
+        return all_faces
+
+    def segment(self, all_faces, deadline=None):
+        """
+        Parses the detected faces and segments their components.
+
+        Args:
+            all_faces (dict): A dictionary mapping image names to (image, faces) tuples.
+            deadline (Deadline): Optional deadline, checked before each image.
+
+        Returns:
+            dict: A dictionary containing the segmented faces and their components.
+        """
+        all_segments = {}
 
-        # Phase 2: Segmentation
         for key, (image_path, faces) in all_faces.items():
+            if deadline is not None and deadline.expired():
+                break
+
             try:
                 image_tensor = self._load_image(image_path)
                 faces = self._parse_faces(image_tensor, faces)
@@ -130,7 +197,7 @@ class FaceSegmentation:
         Returns:
             dict: A dictionary containing face detection results.
         """
-        with torch.inference_mode():
+        with torch.inference_mode(), profile_region('detection'):
             faces = self._face_detector(image)
         return faces
 
@@ -145,7 +212,7 @@ class FaceSegmentation:
         Returns:
             dict: A dictionary containing parsed face results.
         """
-        with torch.inference_mode():
+        with torch.inference_mode(), profile_region('parsing'):
             faces = self._face_parser(image, faces)
         return faces
 
@@ -0,0 +1,120 @@
+"""
+Script converting the pickled models in py_models/*.pth to flat .safetensors weight files,
+which the server memory-maps instead of unpickling.
+
+Usage:
+    python src/convert_models.py [--models 1 2] [--verify-only]
+
+Each converted file is verified by reloading it through the memory-mapped loader and
+comparing every tensor, and the output on a random batch, with the original model.
+"""
+
+import argparse
+import logging
+import sys
+import torch
+from torchvision import models
+from utils.model_selection import MODELS, model_path
+from utils.model_weights import build_model, load_model, save_weights
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _describe(model):
+    """
+    Builds the metadata describing the architecture of a pickled model.
+
+    Args:
+        model (torch.nn.Module): The original model.
+
+    Returns:
+        dict: The metadata stored with the converted weights.
+    """
+    if not isinstance(model, models.ResNet) or not isinstance(model.fc, torch.nn.Linear):
+        raise ValueError(f"Unsupported model structure: {type(model).__name__}")
+
+    return {'architecture': 'resnet50', 'num_classes': model.fc.out_features}
+
+
+def convert(model_name):
+    """
+    Converts a pickled model to a flat weight file.
+
+    Args:
+        model_name (str): The name of the model, without extension.
+    """
+    model = torch.load(model_path(model_name, '.pth'),
+                       map_location=torch.device('cpu'), weights_only=False)
+    metadata = _describe(model)
+
+    expected_keys = set(build_model(metadata, device='meta').state_dict())
+    if set(model.state_dict()) != expected_keys:
+        raise ValueError(f"The weights of {model_name} do not match the "
+                         f"{metadata['architecture']} architecture")
+
+    save_weights(model.state_dict(), model_path(model_name, '.safetensors'), metadata)
+    logging.info("Converted %s", model_name)
+
+
+def verify(model_name):
+    """
+    Checks that the converted weights reproduce the original model.
+
+    Args:
+        model_name (str): The name of the model, without extension.
+
+    Returns:
+        bool: True if every tensor is identical and the outputs on a random batch match.
+    """
+    original = torch.load(model_path(model_name, '.pth'),
+                          map_location=torch.device('cpu'), weights_only=False)
+    original.eval()
+    converted = load_model(model_path(model_name, '.safetensors'))
+
+    original_state = original.state_dict()
+    converted_state = converted.state_dict()
+    if set(original_state) != set(converted_state):
+        logging.error("%s: the converted weights have different tensor names", model_name)
+        return False
+
+    for name, tensor in original_state.items():
+        if not torch.equal(tensor, converted_state[name]):
+            logging.error("%s: tensor %s differs", model_name, name)
+            return False
+
+    batch = torch.rand(2, 3, 224, 224, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        if not torch.allclose(original(batch), converted(batch), rtol=1e-5, atol=1e-6):
+            logging.error("%s: the outputs on a random batch differ", model_name)
+            return False
+
+    logging.info("Verified %s", model_name)
+    return True
+
+
+def main():
+    """Parses the command line arguments and converts and verifies the requested models."""
+    parser = argparse.ArgumentParser(
+        description="Convert the pickled models to memory-mappable weight files")
+    parser.add_argument('--models', nargs='+', default=list(MODELS), choices=list(MODELS),
+                        help="IDs of the models to convert (default: all)")
+    parser.add_argument('--verify-only', action='store_true',
+                        help="only verify previously converted files")
+    args = parser.parse_args()
+
+    success = True
+    for model_id in args.models:
+        model_name = MODELS[model_id][0]
+        try:
+            if not args.verify_only:
+                convert(model_name)
+            success = verify(model_name) and success
+        except Exception as e:
+            logging.error("Error while converting %s: %s", model_name, e)
+            success = False
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,12 @@ class ErrorMessages:
         INVALID_BUFFER (str): Error message for an invalid buffer.
         UNSUPPORTED_TYPE (str): Error message for an unsupported type.
         DATASET_REQUIREMENT (str): Error message for dataset requirements not met.
+        INVALID_OUTPUT_FORMAT (str): Error message for an unsupported output format.
+        INVALID_TOP_K (str): Error message for an invalid top-k value.
+        INVALID_ENCODING (str): Error message for an unsupported probability encoding.
+        INVALID_TIME_BUDGET (str): Error message for an invalid time budget.
+        TIME_BUDGET_EXCEEDED (str): Error message for a request stopped by its time budget.
+        CLIENT_DISCONNECTED (str): Error message for a request stopped by a disconnection.
         INTERNAL_SERVER_ERROR (str): Error message for internal server errors.
 
     Methods:
@@ -27,6 +33,12 @@ class ErrorMessages:
     INVALID_BUFFER = "The file must be a valid Buffer"
     UNSUPPORTED_TYPE = "Unsupported type"
     DATASET_REQUIREMENT = "The dataset must contain images with at least 12 faces"
+    INVALID_OUTPUT_FORMAT = "outputFormat must be either 'default' or 'compact'"
+    INVALID_TOP_K = "topK must be a positive integer"
+    INVALID_ENCODING = "encoding must be one of 'json', 'float16' or 'float32'"
+    INVALID_TIME_BUDGET = "timeBudget must be a positive number of seconds"
+    TIME_BUDGET_EXCEEDED = "The request exceeded its time budget"
+    CLIENT_DISCONNECTED = "The client disconnected before the request completed"
     INTERNAL_SERVER_ERROR = "Internal Server Error"
 
     @staticmethod
@@ -0,0 +1,512 @@
+"""
+Script generating load against the /predict endpoint of the inference server, without the
+Node.js application, Postgres or Redis.
+
+Each job is built exactly like the Bull worker does: a {jsonContents, modelId} body where
+jsonContents is the [name, type, Buffer] list produced by ContentService.reduceContents.
+Contents are either read from disk or generated synthetically.
+
+Usage:
+    python src/load_generator.py --url http://localhost:5000 --duration 60 \\
+        --concurrency 8 --rate 4 --models 1:0.7 2:0.3 --server-pid 1234
+
+Reports throughput (all jobs and successful jobs only), latency percentiles, error rates and
+the RSS of the server and its worker processes over time.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+logging.basicConfig(level=logging.INFO)
+
+# Same mapping as ContentService.mimeTypesMapping, by file extension
+CONTENT_TYPES = {
+    '.jpg': 'image',
+    '.jpeg': 'image',
+    '.png': 'image',
+    '.mp4': 'video',
+    '.zip': 'zip',
+}
+
+
+def _synthetic_image(rng, size):
+    """
+    Generates a JPEG image with a random gradient.
+
+    Args:
+        rng (random.Random): The random generator.
+        size (int): The side of the image in pixels.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image
+
+    start = [rng.randint(0, 255) for _ in range(3)]
+    end = [rng.randint(0, 255) for _ in range(3)]
+    row = bytes(int(s + (e - s) * x / size) for x in range(size) for s, e in zip(start, end))
+
+    buffer = BytesIO()
+    Image.frombytes('RGB', (size, size), row * size).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def _synthetic_video(rng, size, frames):
+    """
+    Generates an MP4 video whose frames are random gradients.
+
+    Args:
+        rng (random.Random): The random generator.
+        size (int): The side of the frames in pixels.
+        frames (int): The number of frames.
+
+    Returns:
+        bytes: The encoded video.
+    """
+    # pylint: disable=import-outside-toplevel
+    import cv2
+    import numpy as np
+
+    with tempfile.NamedTemporaryFile(suffix='.mp4') as video_file:
+        writer = cv2.VideoWriter(video_file.name, cv2.VideoWriter_fourcc(*'mp4v'),
+                                 25, (size, size))
+        gradient = np.linspace(0, 1, size, dtype=np.float32)[None, :, None]
+        for _ in range(frames):
+            color = np.array([rng.randint(0, 255) for _ in range(3)], dtype=np.float32)
+            frame = (gradient * color).repeat(size, axis=0).astype(np.uint8)
+            writer.write(frame)
+        writer.release()
+
+        with open(video_file.name, 'rb') as f:
+            return f.read()
+
+
+def _synthetic_zip(rng, args, depth=1):
+    """
+    Generates a ZIP file with images, a video and, optionally, a nested ZIP file.
+
+    Args:
+        rng (random.Random): The random generator.
+        args (argparse.Namespace): The generation options.
+        depth (int): The remaining nesting depth.
+
+    Returns:
+        bytes: The encoded ZIP file.
+    """
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        for i in range(args.zip_images):
+            zip_file.writestr(f"images/image_{i}.jpg", _synthetic_image(rng, args.image_size))
+        if args.video_frames:
+            zip_file.writestr("videos/video.mp4",
+                              _synthetic_video(rng, args.image_size, args.video_frames))
+        if depth > 0:
+            zip_file.writestr("nested/nested.zip", _synthetic_zip(rng, args, depth - 1))
+    return buffer.getvalue()
+
+
+def build_contents(args):
+    """
+    Builds the pool of contents from the input paths, or synthetically if none are given.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        list: A list of (name, type, data) tuples.
+    """
+    contents = []
+
+    for path in args.inputs:
+        paths = [path]
+        if os.path.isdir(path):
+            paths = sorted(os.path.join(path, name) for name in os.listdir(path))
+        for file_path in paths:
+            content_type = CONTENT_TYPES.get(os.path.splitext(file_path)[1].lower())
+            if content_type and os.path.isfile(file_path):
+                with open(file_path, 'rb') as f:
+                    contents.append((os.path.basename(file_path), content_type, f.read()))
+
+    if contents:
+        return contents
+
+    rng = random.Random(args.seed)
+    for i in range(args.images):
+        contents.append((f"image_{i}.jpg", 'image', _synthetic_image(rng, args.image_size)))
+    for i in range(args.videos):
+        contents.append((f"video_{i}.mp4", 'video',
+                         _synthetic_video(rng, args.image_size, args.video_frames)))
+    for i in range(args.zips):
+        contents.append((f"archive_{i}.zip", 'zip', _synthetic_zip(rng, args)))
+    return contents
+
+
+def reduce_contents(contents):
+    """
+    Reproduces ContentService.reduceContents followed by the JSON serialization of axios,
+    where each Node.js Buffer becomes {"type": "Buffer", "data": [bytes]}.
+
+    Args:
+        contents (list): A list of (name, type, data) tuples.
+
+    Returns:
+        list: The jsonContents list.
+    """
+    return [[name, content_type, {'type': 'Buffer', 'data': list(data)}]
+            for name, content_type, data in contents]
+
+
+def build_jobs(contents, args):
+    """
+    Pre-serializes a pool of job bodies for each model, so that the client does not spend
+    CPU on JSON encoding during the run.
+
+    Args:
+        contents (list): The pool of contents.
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        dict: A dictionary mapping each model ID to a list of encoded bodies.
+    """
+    rng = random.Random(args.seed)
+    jobs = {}
+    for model_id in args.models:
+        jobs[model_id] = []
+        for _ in range(args.job_pool):
+            selected = rng.sample(contents, min(args.contents_per_job, len(contents)))
+            body = {'jsonContents': reduce_contents(selected), 'modelId': model_id}
+            # Compact separators, like JSON.stringify in the Node.js worker
+            jobs[model_id].append(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+    return jobs
+
+
+def _process_rss(pid):
+    """
+    Reads the resident set size of a single process from /proc.
+
+    Args:
+        pid (int): The process ID.
+
+    Returns:
+        int or None: The RSS in bytes, or None if it cannot be read.
+    """
+    try:
+        with open(f"/proc/{pid}/status", 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _child_pids(pid):
+    """
+    Lists the child processes of a process, across all its threads.
+
+    Args:
+        pid (int): The process ID.
+
+    Returns:
+        list: The child process IDs, empty if they cannot be read.
+    """
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            try:
+                with open(f"/proc/{pid}/task/{task}/children", 'r', encoding='utf-8') as f:
+                    children.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+    except OSError:
+        pass
+    return children
+
+
+def read_rss(pid):
+    """
+    Reads the resident set size of a process and of all its descendants, such as the
+    clustering and video decoding worker pools of the server.
+
+    Args:
+        pid (int): The process ID.
+
+    Returns:
+        int or None: The total RSS in bytes, or None if the process cannot be read.
+    """
+    total = _process_rss(pid)
+    if total is None:
+        return None
+
+    pending = _child_pids(pid)
+    seen = {pid}
+    while pending:
+        child = pending.pop()
+        if child in seen:
+            continue
+        seen.add(child)
+        rss = _process_rss(child)
+        if rss is not None:
+            total += rss
+            pending.extend(_child_pids(child))
+    return total
+
+
+class LoadGenerator:
+    """
+    LoadGenerator class to send jobs to the inference server and collect the measurements.
+    """
+
+    def __init__(self, args, jobs):
+        """
+        Initializes the LoadGenerator with the run options and the job bodies.
+
+        Args:
+            args (argparse.Namespace): The command line arguments.
+            jobs (dict): A dictionary mapping each model ID to a list of encoded bodies.
+        """
+        self._args = args
+        self._jobs = jobs
+        self._rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self._results = []
+        self._rss = []
+        self._stop = threading.Event()
+
+    def _send(self, model_id, body, scheduled_at):
+        """
+        Sends a single job and records its outcome.
+
+        Args:
+            model_id (str): The ID of the model.
+            body (bytes): The encoded job body.
+            scheduled_at (float): The time at which the job was due, so that queueing
+                                  delay on the client side is included in the latency.
+        """
+        request = urllib.request.Request(f"{self._args.url}/predict", data=body,
+                                         headers={'Content-Type': 'application/json'})
+        error = None
+        try:
+            with urllib.request.urlopen(request, timeout=self._args.timeout) as response:
+                payload = json.loads(response.read())
+            # The server reports errors in the body, as the Node.js worker expects
+            if isinstance(payload, dict) and 'error' in payload and 'error_code' in payload:
+                error = str(payload['error_code'])
+        except urllib.error.HTTPError as e:
+            error = str(e.code)
+        except Exception as e:
+            error = type(e).__name__
+
+        finished_at = time.perf_counter()
+        with self._lock:
+            self._results.append((model_id, scheduled_at, finished_at, error))
+
+    def _sample_rss(self, started_at):
+        """
+        Samples the RSS of the server process until the run stops.
+
+        Args:
+            started_at (float): The start time of the run.
+        """
+        while not self._stop.is_set():
+            rss = read_rss(self._args.server_pid)
+            if rss is not None:
+                self._rss.append((round(time.perf_counter() - started_at, 1), rss))
+            self._stop.wait(self._args.rss_interval)
+
+    def _next_model(self):
+        """
+        Picks a model according to the configured mix.
+
+        Returns:
+            str: The ID of the model.
+        """
+        return self._rng.choices(list(self._args.models),
+                                 weights=list(self._args.models.values()))[0]
+
+    def run(self):
+        """
+        Runs the load for the configured duration or number of jobs.
+
+        Returns:
+            dict: The report of the run.
+        """
+        args = self._args
+        started_at = time.perf_counter()
+
+        if args.server_pid:
+            threading.Thread(target=self._sample_rss, args=(started_at,), daemon=True).start()
+
+        sent = 0
+        next_at = started_at
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            while (args.jobs is None or sent < args.jobs) \
+                    and time.perf_counter() - started_at < args.duration:
+                if args.rate > 0:
+                    # Open loop: Poisson arrivals, independent of the response times
+                    next_at += self._rng.expovariate(args.rate)
+                    time.sleep(max(0.0, next_at - time.perf_counter()))
+                else:
+                    # Closed loop: keep exactly 'concurrency' jobs in flight
+                    while sent - len(self._results) >= args.concurrency:
+                        time.sleep(0.001)
+                    next_at = time.perf_counter()
+
+                model_id = self._next_model()
+                executor.submit(self._send, model_id, self._rng.choice(self._jobs[model_id]),
+                                next_at)
+                sent += 1
+
+        elapsed = time.perf_counter() - started_at
+        self._stop.set()
+        return self._report(elapsed)
+
+    def _report(self, elapsed):
+        """
+        Aggregates the measurements of the run.
+
+        Args:
+            elapsed (float): The duration of the run in seconds.
+
+        Returns:
+            dict: The report of the run.
+        """
+        report = {'duration': round(elapsed, 2), 'models': {}}
+
+        groups = {'all': self._results}
+        for model_id in self._args.models:
+            groups[model_id] = [result for result in self._results if result[0] == model_id]
+
+        for name, results in groups.items():
+            latencies = sorted(finished - scheduled for _, scheduled, finished, _ in results)
+            errors = {}
+            for result in results:
+                if result[3] is not None:
+                    errors[result[3]] = errors.get(result[3], 0) + 1
+
+            stats = {
+                'jobs': len(results),
+                'throughput': round(len(results) / elapsed, 3) if elapsed else 0,
+                'successful_throughput': round((len(results) - sum(errors.values())) / elapsed, 3)
+                                         if elapsed else 0,
+                'error_rate': round(sum(errors.values()) / len(results), 4) if results else 0,
+                'errors': errors,
+            }
+            for percentile in (50, 90, 95, 99):
+                stats[f"p{percentile}"] = round(_percentile(latencies, percentile), 4)
+            stats['max'] = round(latencies[-1], 4) if latencies else 0
+
+            if name == 'all':
+                report.update(stats)
+            else:
+                report['models'][name] = stats
+
+        if self._rss:
+            report['rss'] = {
+                'peak': max(rss for _, rss in self._rss),
+                'samples': self._rss
+            }
+
+        return report
+
+
+def _percentile(values, percentile):
+    """
+    Computes a nearest-rank percentile.
+
+    Args:
+        values (list): The sorted values.
+        percentile (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0 if there are no values.
+    """
+    if not values:
+        return 0
+    rank = max(0, min(len(values) - 1, int(round(percentile / 100 * len(values))) - 1))
+    return values[rank]
+
+
+def _model_mix(value):
+    """
+    Parses a model weight in the 'id:weight' form, e.g. '1:0.7'.
+
+    Args:
+        value (str): The command line value.
+
+    Returns:
+        tuple: A tuple containing the model ID and its weight.
+    """
+    model_id, _, weight = value.partition(':')
+    return model_id, float(weight or 1)
+
+
+def main():
+    """Parses the command line arguments, runs the load and prints the report."""
+    parser = argparse.ArgumentParser(
+        description="Replay Node.js style inference jobs against the /predict endpoint")
+    parser.add_argument('--url', default='http://localhost:5000', help="server base URL")
+    parser.add_argument('--inputs', nargs='*', default=[],
+                        help="image, video and ZIP files or directories (default: synthetic)")
+    parser.add_argument('--models', nargs='+', type=_model_mix, default=[('1', 1.0)],
+                        help="model mix as id:weight pairs, e.g. 1:0.7 2:0.3")
+    parser.add_argument('--concurrency', type=int, default=4, help="maximum jobs in flight")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="job arrival rate per second (default: closed loop)")
+    parser.add_argument('--duration', type=float, default=60, help="run duration in seconds")
+    parser.add_argument('--jobs', type=int, help="stop after this number of jobs")
+    parser.add_argument('--timeout', type=float, default=600, help="request timeout in seconds")
+    parser.add_argument('--contents-per-job', type=int, default=1,
+                        help="contents sent in each job")
+    parser.add_argument('--job-pool', type=int, default=16,
+                        help="distinct job bodies prepared for each model")
+    parser.add_argument('--images', type=int, default=8, help="synthetic images")
+    parser.add_argument('--videos', type=int, default=1, help="synthetic videos")
+    parser.add_argument('--zips', type=int, default=1, help="synthetic ZIP files")
+    parser.add_argument('--zip-images', type=int, default=4,
+                        help="images in each synthetic ZIP file")
+    parser.add_argument('--video-frames', type=int, default=25,
+                        help="frames in each synthetic video")
+    parser.add_argument('--image-size', type=int, default=256,
+                        help="side of the synthetic images and frames")
+    parser.add_argument('--server-pid', type=int,
+                        help="server process ID, to sample its RSS and that of its workers")
+    parser.add_argument('--rss-interval', type=float, default=1.0,
+                        help="RSS sampling interval in seconds")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--output', help="also write the report to this JSON file")
+    args = parser.parse_args()
+    args.models = dict(args.models)
+
+    contents = build_contents(args)
+    if not contents:
+        parser.error("no contents to send")
+    logging.info("Prepared %d contents, building job bodies", len(contents))
+    jobs = build_jobs(contents, args)
+
+    report = LoadGenerator(args, jobs).run()
+
+    summary = {key: value for key, value in report.items() if key != 'rss'}
+    if 'rss' in report:
+        summary['rss_peak'] = report['rss']['peak']
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+Entry point of the inference server.
+
+The worker processes of the clustering and video decoding pools are spawned, and a spawned
+process re-imports the main module of its parent. This module therefore imports the server
+only when run as a script, so the workers do not load Flask, Redis or the models.
+
+Usage:
+    python src/main.py
+"""
+
+if __name__ == '__main__':
+    from server import app
+
+    app.run(host='0.0.0.0', port=5000)
@@ -1,19 +1,33 @@
 """
 Module implementing a Flask server for predicting based on JSON data.
+The clustering stack is imported on first use, so classification-only workers start faster.
 """
 
+import math
 import os
+import multiprocessing
+import threading
 from io import BytesIO
 from http import HTTPStatus
-from flask import Flask, request, jsonify # type: ignore
-import redis
+from utils.startup import startup_report
+
+with startup_report.measure('import', 'flask'):
+    from flask import Flask, request, jsonify # type: ignore
+with startup_report.measure('import', 'redis'):
+    import redis
 from dotenv import load_dotenv
 from PIL import Image
-from clustering.clustering import Clustering
-from utils.image_processing import predict_image
-from utils.zip_processing import process_zip
-from utils.model_selection import select_model
+with startup_report.measure('import', 'utils.image_processing'):
+    from utils.image_processing import predict_image, submit_image, format_probabilities
+with startup_report.measure('import', 'utils.zip_processing'):
+    from utils.zip_processing import process_zip
+from utils.model_selection import select_model, preload_models, is_model_loaded
 from utils.video_processing import process_video
+from utils.result_formatting import ResultFormatter, OUTPUT_FORMATS, ENCODINGS
+from utils.cancellation import Deadline, DISCONNECTED
+from utils.batching import get_batcher, batching_metrics, RequestBatch
+from utils.profiling import (RequestProfiler, profile_region, requested_profile_mode,
+                             is_profiling, default_output_dir, PROFILE_MODES)
 from error.error import CustomError
 from error.error_messages import ErrorMessages
 
@@ -32,12 +46,101 @@ redis_host = os.getenv('REDIS_HOST', 'localhost')
 redis_port = int(os.getenv('REDIS_PORT', 6379))
 r = redis.Redis(host=redis_host, port=redis_port, db=0)
 
+# Configure the default time budget of a request in seconds, 0 for no limit
+default_time_budget = float(os.getenv('REQUEST_TIME_BUDGET', '0'))
+
+# Configure request profiling, disabled unless requested or sampled
+profile_sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+profile_default_mode = os.getenv('PROFILE_MODE', 'torch')
+if profile_default_mode not in PROFILE_MODES:
+    raise ValueError(f"Invalid PROFILE_MODE {profile_default_mode!r}, "
+                     f"expected one of {', '.join(PROFILE_MODES)}")
+profile_dir = os.getenv('PROFILE_DIR', default_output_dir())
+
+# Configure the batching of single-image requests, 1 to disable it
+batch_max_size = int(os.getenv('BATCH_MAX_SIZE', '8'))
+batch_max_wait = float(os.getenv('BATCH_MAX_WAIT_MS', '5')) / 1000
+
+# Configure the worker processes of the clustering, 0 to run it in the server process
+clustering_workers = int(os.getenv('CLUSTERING_WORKERS', '0'))
+clustering_shard_size = int(os.getenv('CLUSTERING_SHARD_SIZE', '0')) or None
+
+# Configure the models to load at startup, in the background
+preload_model_ids = [model_id.strip() for model_id in os.getenv('PRELOAD_MODELS', '1,2').split(',')
+                     if model_id.strip()]
+# Spawned worker processes re-import this module when it is run directly instead of
+# through main.py (see utils/process_pool.py); they never serve requests
+if multiprocessing.parent_process() is None:
+    threading.Thread(target=preload_models, args=(preload_model_ids,), daemon=True).start()
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness endpoint, successful only once all the models listed in PRELOAD_MODELS
+    are resident in memory.
+
+    Returns:
+        JSON response with the state of each model and the startup timings.
+    """
+    models = {model_id: is_model_loaded(model_id) for model_id in preload_model_ids}
+    is_ready = all(models.values())
+    status = HTTPStatus.OK if is_ready else HTTPStatus.SERVICE_UNAVAILABLE
+
+    return jsonify({'ready': is_ready, 'models': models,
+                    'startup': startup_report.as_dict()}), status
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Endpoint exposing the batching metrics of each model.
+
+    Returns:
+        JSON response with the number of batches and images, the average batch size,
+        the fill rate and the queueing delay of each model.
+    """
+    return jsonify({'batching': batching_metrics()})
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
     Endpoint to predict based on the provided JSON data.
     Accepts 'image', 'zip', and 'video' file types.
 
+    Optional fields:
+        outputFormat (str): 'default' (list of probability/class name entries) or
+                            'compact' (class names listed once, probability matrices).
+        topK (int): Keep only the k most probable classes for each image or frame.
+        encoding (str): 'json', 'float16' or 'float32' probability matrices in compact format.
+        profile (bool or str): Profile this request, like the X-Profile header
+                               ('torch', 'cprofile', 'both' or true for PROFILE_MODE).
+        timeBudget (float): Seconds after which the processing stops, like the X-Time-Budget
+                            header (default REQUEST_TIME_BUDGET). Processing also stops
+                            when the client disconnects.
+        allowPartial (bool): Return the results computed before the processing stopped,
+                             as {"complete", "reason", "results"}, instead of an error.
+
+    Returns:
+        JSON response with prediction results or error messages. When the request is
+        profiled, the X-Profile-Trace header lists the trace files written.
+    """
+    data = request.get_json(silent=True)
+    mode = requested_profile_mode(request.headers.get('X-Profile'),
+                                  data.get('profile') if isinstance(data, dict) else None,
+                                  profile_sample_rate, profile_default_mode)
+    if mode is None:
+        return _predict()
+
+    profiler = RequestProfiler(mode, profile_dir)
+    with profiler:
+        response = _predict()
+    if profiler.paths:
+        response.headers['X-Profile-Trace'] = ','.join(profiler.paths)
+    return response
+
+def _predict():
+    """
+    Runs the prediction of the current request.
+
     Returns:
         JSON response with prediction results or error messages.
     """
@@ -50,10 +153,26 @@ def predict():
 
             json_contents = data.get('jsonContents')
             model_id = data.get('modelId')
+            output_format = data.get('outputFormat', 'default')
+            top_k = data.get('topK')
+            encoding = data.get('encoding', 'json')
 
             if not isinstance(json_contents, list):
                 raise CustomError(ErrorMessages.JSON_CONTENTS_NOT_LIST, HTTPStatus.BAD_REQUEST)
 
+            if output_format not in OUTPUT_FORMATS:
+                raise CustomError(ErrorMessages.INVALID_OUTPUT_FORMAT, HTTPStatus.BAD_REQUEST)
+
+            if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool)
+                                      or top_k < 1):
+                raise CustomError(ErrorMessages.INVALID_TOP_K, HTTPStatus.BAD_REQUEST)
+
+            if encoding not in ENCODINGS:
+                raise CustomError(ErrorMessages.INVALID_ENCODING, HTTPStatus.BAD_REQUEST)
+
+            allow_partial = data.get('allowPartial') is True
+            deadline = Deadline(_time_budget(data), request.environ.get('werkzeug.socket'))
+
             model, class_names = select_model(model_id)
 
             if not model:
@@ -63,8 +182,14 @@ def predict():
                 all_images = []
             else:
                 all_results = {}
+                # Images queued on the batcher, collected once all the contents are read
+                request_batch = None
+                formatter = ResultFormatter(class_names, output_format, top_k, encoding)
 
             for item in json_contents:
+                if deadline.expired():
+                    break
+
                 if not isinstance(item, list) or len(item) != 3:
                     raise CustomError(ErrorMessages.INVALID_JSON_CONTENT, HTTPStatus.BAD_REQUEST)
                 filename, file_type, file = item
@@ -80,40 +205,67 @@ def predict():
                 file_data = bytes(file.get('data'))
 
                 if file_type == 'image':
-                    input_image = Image.open(BytesIO(file_data))
+                    with profile_region('decoding'):
+                        input_image = Image.open(BytesIO(file_data))
                     if model == 'clustering':
                         all_images.append([filename, input_image])
+                    elif batch_max_size > 1 and not is_profiling():
+                        if request_batch is None:
+                            request_batch = RequestBatch(
+                                get_batcher(model_id, model, batch_max_size, batch_max_wait),
+                                batch_max_size)
+                        # Reserves the position of the image in the results
+                        all_results[filename] = None
+                        submit_image(input_image, request_batch, filename)
                     else:
-                        all_results[filename] = predict_image(input_image, model, class_names)
+                        all_results[filename] = formatter.format_item(
+                            filename, file_type, predict_image(input_image, model, class_names))
 
                 elif file_type == 'zip':
-                    zip_data = process_zip(file_data, model, class_names)
+                    zip_data = process_zip(file_data, model, class_names, deadline)
                     if model == 'clustering':
                         all_images.extend([[f"{filename}/{name}", img] for name, img in zip_data])
                     else:
-                        all_results[filename] = zip_data
+                        all_results[filename] = formatter.format_item(filename, file_type, zip_data)
 
                 elif file_type == 'video':
-                    video_data = process_video(file_data, model, class_names)
+                    video_data = process_video(file_data, model, class_names, deadline)
                     if model == 'clustering':
                         all_images.extend([[f"{filename}/{name}", img] for name, img in video_data])
                     else:
-                        all_results[filename] = video_data
+                        all_results[filename] = formatter.format_item(filename, file_type,
+                                                                      video_data)
 
                 else:
                     raise CustomError(f"{ErrorMessages.UNSUPPORTED_TYPE}: {file_type}",
                                       HTTPStatus.BAD_REQUEST)
 
             if model == 'clustering':
-                clustering_instance = Clustering()
-                result = clustering_instance.execute(all_images)
+                with startup_report.measure('import', 'clustering.clustering'):
+                    # pylint: disable=import-outside-toplevel
+                    from clustering.clustering import Clustering
+
+                clustering_instance = Clustering(clustering_workers, clustering_shard_size)
+                result = clustering_instance.execute(all_images, deadline)
+
+                if deadline.reason is not None and (not allow_partial or not result):
+                    raise _stopped_error(deadline)
 
                 if not result:
                     raise CustomError(ErrorMessages.DATASET_REQUIREMENT, HTTPStatus.BAD_REQUEST)
 
-                return jsonify(result)
+                return jsonify(_with_completeness(result, deadline, allow_partial))
             else:
-                return jsonify(all_results)
+                if request_batch is not None:
+                    for filename, probabilities in request_batch.results().items():
+                        all_results[filename] = formatter.format_item(
+                            filename, 'image', format_probabilities(probabilities, class_names))
+
+                if deadline.reason is not None and not allow_partial:
+                    raise _stopped_error(deadline)
+
+                return jsonify(_with_completeness(formatter.finalize(all_results),
+                                                  deadline, allow_partial))
 
         except CustomError as e:
             return jsonify({'error': e.message, 'error_code': e.status_code})
@@ -123,5 +275,56 @@ def predict():
 
     return jsonify({'error': 'Method not allowed', 'error_code': HTTPStatus.METHOD_NOT_ALLOWED})
 
+def _time_budget(data):
+    """
+    Reads the time budget of the current request.
+
+    Args:
+        data (dict): The JSON body of the request.
+
+    Returns:
+        float or None: The budget in seconds, or None if the request has no time limit.
+    """
+    budget = data.get('timeBudget', request.headers.get('X-Time-Budget', default_time_budget))
+    try:
+        budget = float(budget)
+    except (TypeError, ValueError):
+        raise CustomError(ErrorMessages.INVALID_TIME_BUDGET, HTTPStatus.BAD_REQUEST) from None
+
+    if not math.isfinite(budget) or budget < 0 or isinstance(data.get('timeBudget'), bool):
+        raise CustomError(ErrorMessages.INVALID_TIME_BUDGET, HTTPStatus.BAD_REQUEST)
+
+    return budget or None
+
+def _stopped_error(deadline):
+    """
+    Builds the error returned when a request is stopped before completion.
+
+    Args:
+        deadline (Deadline): The deadline that stopped the request.
+
+    Returns:
+        CustomError: The error to raise.
+    """
+    if deadline.reason == DISCONNECTED:
+        return CustomError(ErrorMessages.CLIENT_DISCONNECTED, HTTPStatus.REQUEST_TIMEOUT)
+    return CustomError(ErrorMessages.TIME_BUDGET_EXCEEDED, HTTPStatus.REQUEST_TIMEOUT)
+
+def _with_completeness(payload, deadline, allow_partial):
+    """
+    Adds the completeness marker to the response of requests accepting partial results.
+
+    Args:
+        payload (dict): The response payload.
+        deadline (Deadline): The deadline of the request.
+        allow_partial (bool): Whether the request accepts partial results.
+
+    Returns:
+        dict: The payload, wrapped with the marker when partial results are accepted.
+    """
+    if not allow_partial:
+        return payload
+    return {'complete': deadline.reason is None, 'reason': deadline.reason, 'results': payload}
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,263 @@
+"""
+Module: batching.py
+
+This module provides the DynamicBatcher class, which groups the images of one or more
+concurrent requests into one forward pass, and the RequestBatch class, which queues the
+images of a request in full batches. Requests enqueue their preprocessed tensors and a
+dispatcher thread runs the model as soon as the batch is full or the oldest tensor has
+waited for the maximum delay, then hands each request its own probabilities.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+
+logging.basicConfig(level=logging.INFO)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+class DynamicBatcher:
+    """
+    DynamicBatcher class to batch the classification of images across requests.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait=0.005):
+        """
+        Initializes the DynamicBatcher and starts its dispatcher thread.
+
+        Args:
+            model (torch.nn.Module): The model used for classification.
+            max_batch_size (int): Maximum number of images in a forward pass.
+            max_wait (float): Maximum time in seconds the first image of a batch waits
+                              for other images.
+        """
+        self._model = model
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = queue.Queue()
+
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._full_batches = 0
+        self._queue_wait = 0.0
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, input_tensor, wait=True):
+        """
+        Queues a preprocessed image for classification, without waiting for its batch,
+        so a request can queue all its images before collecting the results.
+
+        Args:
+            input_tensor (torch.Tensor): The preprocessed image, without batch dimension.
+            wait (bool): Whether the batch containing the image may wait for images of
+                         other requests. If False it is dispatched with the images
+                         already queued.
+
+        Returns:
+            concurrent.futures.Future: A future resolving to the probability of each class.
+        """
+        future = Future()
+        self._queue.put((input_tensor, future, time.perf_counter(), wait))
+        return future
+
+    def classify(self, input_tensors):
+        """
+        Classifies a full batch of preprocessed images in the calling thread, without
+        going through the queue: a full batch gains nothing from waiting for other images.
+
+        Args:
+            input_tensors (list): The preprocessed images, without batch dimension.
+
+        Returns:
+            torch.Tensor: The probability of each class, one row per image.
+        """
+        probabilities = self._forward(input_tensors)
+        self._record(len(input_tensors), 0.0)
+        return probabilities
+
+    def metrics(self):
+        """
+        Returns the batching metrics since the batcher was created.
+
+        Returns:
+            dict: The number of batches and images, the average batch size, the fill rate
+                  (average batch size over the maximum) and the average queueing delay.
+        """
+        with self._metrics_lock:
+            average = self._items / self._batches if self._batches else 0
+            return {
+                'max_batch_size': self._max_batch_size,
+                'max_wait_ms': self._max_wait * 1000,
+                'batches': self._batches,
+                'images': self._items,
+                'full_batches': self._full_batches,
+                'average_batch_size': round(average, 3),
+                'fill_rate': round(average / self._max_batch_size, 3),
+                'average_queue_wait_ms': round(self._queue_wait / self._items * 1000, 3)
+                                         if self._items else 0
+            }
+
+    def _collect(self):
+        """
+        Waits for the first image, then collects images until the batch is full
+        or the maximum delay has elapsed. A batch containing an image that must not
+        wait only collects the images already queued.
+
+        Returns:
+            list: A list of (tensor, future, enqueued_at, wait) tuples.
+        """
+        batch = [self._queue.get()]
+        flush_at = time.perf_counter() + self._max_wait
+
+        while len(batch) < self._max_batch_size:
+            remaining = flush_at - time.perf_counter()
+            try:
+                if remaining > 0 and all(wait for _, _, _, wait in batch):
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _forward(self, input_tensors):
+        """
+        Runs the model on a batch of preprocessed images.
+
+        Args:
+            input_tensors (list): The preprocessed images, without batch dimension.
+
+        Returns:
+            torch.Tensor: The probability of each class, one row per image.
+        """
+        input_batch = torch.stack(input_tensors)
+        with torch.no_grad():
+            output = self._model(input_batch)
+        return torch.nn.functional.softmax(output, dim=1)
+
+    def _record(self, batch_size, queue_wait):
+        """
+        Adds a batch to the metrics.
+
+        Args:
+            batch_size (int): The number of images in the batch.
+            queue_wait (float): The total time in seconds its images spent in the queue.
+        """
+        with self._metrics_lock:
+            self._batches += 1
+            self._items += batch_size
+            self._full_batches += batch_size == self._max_batch_size
+            self._queue_wait += queue_wait
+
+    def _run(self):
+        """Dispatcher loop, running one forward pass per collected batch."""
+        while True:
+            batch = self._collect()
+            started_at = time.perf_counter()
+
+            try:
+                probabilities = self._forward([input_tensor for input_tensor, _, _, _ in batch])
+                for i, (_, future, _, _) in enumerate(batch):
+                    future.set_result(probabilities[i])
+
+            except Exception as e:
+                logging.error("Error during batched inference: %s", e)
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self._record(len(batch), sum(started_at - enqueued_at
+                                         for _, _, enqueued_at, _ in batch))
+
+
+class RequestBatch:
+    """
+    RequestBatch class to classify the images of one request in full batches. Each full
+    batch runs directly in the request thread; the remainder is queued on the
+    DynamicBatcher by results(), where it waits for the images of other requests only if
+    the request filled no batch itself, e.g. a single-image request.
+    """
+
+    def __init__(self, batcher, batch_size):
+        """
+        Initializes the RequestBatch.
+
+        Args:
+            batcher (DynamicBatcher): The batcher of the model used for classification.
+            batch_size (int): The number of images classified together.
+        """
+        self._batcher = batcher
+        self._batch_size = batch_size
+        self._waiting = []
+        self._results = {}
+
+    def add(self, key, input_tensor):
+        """
+        Adds a preprocessed image, classifying the images added so far once they fill
+        a batch.
+
+        Args:
+            key (str): The key of the image in the results.
+            input_tensor (torch.Tensor): The preprocessed image, without batch dimension.
+        """
+        self._waiting.append((key, input_tensor))
+        if len(self._waiting) >= self._batch_size:
+            probabilities = self._batcher.classify([tensor for _, tensor in self._waiting])
+            for i, (waiting_key, _) in enumerate(self._waiting):
+                self._results[waiting_key] = probabilities[i]
+            self._waiting = []
+
+    def results(self):
+        """
+        Classifies the remaining images through the batcher and returns the probabilities
+        of every image.
+
+        Returns:
+            dict: A dictionary mapping the keys of the images to the probability of each class.
+        """
+        wait = not self._results
+        futures = [(key, self._batcher.submit(tensor, wait)) for key, tensor in self._waiting]
+        self._waiting = []
+
+        for key, future in futures:
+            self._results[key] = future.result()
+        return self._results
+
+
+def get_batcher(model_id, model, max_batch_size, max_wait):
+    """
+    Returns the batcher of a model, creating it on first use.
+
+    Args:
+        model_id (str): The ID of the model.
+        model (torch.nn.Module): The model used for classification.
+        max_batch_size (int): Maximum number of images in a forward pass.
+        max_wait (float): Maximum time in seconds an image waits for a batch.
+
+    Returns:
+        DynamicBatcher: The batcher.
+    """
+    with _batchers_lock:
+        if model_id not in _batchers:
+            _batchers[model_id] = DynamicBatcher(model, max_batch_size, max_wait)
+        return _batchers[model_id]
+
+
+def batching_metrics():
+    """
+    Returns the metrics of every batcher.
+
+    Returns:
+        dict: A dictionary mapping model IDs to batching metrics.
+    """
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {model_id: batcher.metrics() for model_id, batcher in batchers.items()}
@@ -0,0 +1,115 @@
+"""
+Module: cancellation.py
+
+This module provides the Deadline class, used to stop the processing of a request
+cooperatively when its time budget is exhausted or its client has disconnected.
+The processing functions check the deadline between items (images, frames, files),
+so the results computed so far remain available.
+"""
+
+import socket
+import time
+
+TIMEOUT = 'timeout'
+DISCONNECTED = 'disconnected'
+CANCELLED = 'cancelled'
+
+
+class Deadline:
+    """
+    Deadline class to track the time budget and the connection of a request.
+
+    Attributes:
+        reason (str or None): 'timeout', 'disconnected' or 'cancelled' once a check has
+                              reported that the processing must stop, otherwise None.
+    """
+
+    def __init__(self, budget=None, connection=None, disconnect_check_interval=0.5,
+                 expires_at=None, cancel_event=None):
+        """
+        Initializes the Deadline.
+
+        Args:
+            budget (float or None): The time budget in seconds, None for no limit.
+            connection (socket.socket or None): The client connection, used to detect
+                                                disconnections when available.
+            disconnect_check_interval (float): Minimum delay in seconds between two checks
+                                               of the connection.
+            expires_at (float or None): Absolute time.monotonic() expiry, used instead of the
+                                        budget to share a deadline with worker processes.
+            cancel_event (multiprocessing.Event or None): Event set by another process to
+                                                          stop the processing, e.g. when its
+                                                          client has disconnected.
+        """
+        if expires_at is not None:
+            self._expires_at = expires_at
+        else:
+            self._expires_at = time.monotonic() + budget if budget else None
+        self._connection = connection
+        self._disconnect_check_interval = disconnect_check_interval
+        self._next_disconnect_check = 0.0
+        self._cancel_event = cancel_event
+        self.reason = None
+
+    def expired(self):
+        """
+        Checks whether the processing must stop.
+
+        Returns:
+            bool: True if the time budget is exhausted or the client has disconnected.
+        """
+        if self.reason is not None:
+            return True
+
+        now = time.monotonic()
+        if self._expires_at is not None and now >= self._expires_at:
+            self.reason = TIMEOUT
+        elif self._connection is not None and now >= self._next_disconnect_check:
+            self._next_disconnect_check = now + self._disconnect_check_interval
+            if self._is_disconnected():
+                self.reason = DISCONNECTED
+        elif self._cancel_event is not None and self._cancel_event.is_set():
+            self.reason = CANCELLED
+
+        return self.reason is not None
+
+    @property
+    def expires_at(self):
+        """
+        Returns the absolute expiry of the time budget.
+
+        Returns:
+            float or None: The time.monotonic() value at which the budget is exhausted,
+                           or None if there is no time limit.
+        """
+        return self._expires_at
+
+    def remaining(self):
+        """
+        Returns the time left before the budget is exhausted.
+
+        Returns:
+            float or None: The remaining seconds, or None if there is no time limit.
+        """
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def _is_disconnected(self):
+        """
+        Peeks at the client connection without consuming data: an orderly shutdown
+        or a reset by the peer means the client is gone.
+
+        Returns:
+            bool: True if the client has closed the connection.
+        """
+        try:
+            return self._connection.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        except BlockingIOError:
+            return False
+        except (ConnectionError, OSError):
+            return True
+        except ValueError:
+            # Sockets that do not support these flags, e.g. TLS sockets
+            self._connection = None
+            return False
@@ -6,6 +6,14 @@ This module provides functions for image preprocessing and prediction using a pr
 
 from torchvision import transforms
 import torch
+from .profiling import profile_region
+
+preprocess = transforms.Compose([
+    transforms.Resize(256),
+    transforms.CenterCrop(224),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+])
 
 
 def predict_image(input_image, model, class_names):
@@ -21,21 +29,45 @@ def predict_image(input_image, model, class_names):
     Returns:
         list: A list of dictionaries containing probabilities and class names.
     """
-    preprocess = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
-
-    input_tensor = preprocess(input_image)
-    input_batch = input_tensor.unsqueeze(0)
+    with profile_region('preprocessing'):
+        input_tensor = preprocess(input_image)
+        input_batch = input_tensor.unsqueeze(0)
 
-    with torch.no_grad():
+    with torch.no_grad(), profile_region('forward'):
         output = model(input_batch)
 
     probabilities = torch.nn.functional.softmax(output[0], dim=0)
 
+    return format_probabilities(probabilities, class_names)
+
+
+def submit_image(input_image, request_batch, key):
+    """
+    Preprocesses the input image in the calling thread and adds it to the batch of its
+    request, to be classified by a DynamicBatcher together with the other queued images.
+
+    Args:
+        input_image (PIL.Image): The input image to classify.
+        request_batch (RequestBatch): The batch of the request.
+        key (str): The key of the image in the results of the batch.
+    """
+    with profile_region('preprocessing'):
+        input_tensor = preprocess(input_image)
+
+    request_batch.add(key, input_tensor)
+
+
+def format_probabilities(probabilities, class_names):
+    """
+    Converts the probabilities of an image to the result format of the server.
+
+    Args:
+        probabilities (torch.Tensor): The probability of each class.
+        class_names (dict): A dictionary mapping class indices to class names.
+
+    Returns:
+        list: A list of dictionaries containing probabilities and class names.
+    """
     results = []
     for i in range(probabilities.size(0)):
         class_name = class_names[str(i)]
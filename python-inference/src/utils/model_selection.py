@@ -2,54 +2,133 @@
 Module: model_selection.py
 
 This module provides a function to select and load models based on the given model ID.
+Loaded models are kept in memory, so each model is read from disk only once per process.
+When a converted .safetensors file is available next to the .pth file, its weights are
+memory-mapped and shared with the other processes of the node instead of being unpickled.
 """
 
 import json
+import logging
 import os
+import threading
 import torch
+from .model_weights import load_model
+from .startup import startup_report
+
+logging.basicConfig(level=logging.INFO)
+
+MODELS = {
+    "1": ('armocromia_12_seasons_resnet50_full', 'class_names_12.json'),
+    "2": ('armocromia_4_seasons_resnet50_full', 'class_names_4.json'),
+}
+
+_loaded_models = {}
+_load_lock = threading.Lock()
+
+
+def model_path(model_name, extension):
+    """
+    Builds the path of a model artifact in the py_models directory.
+
+    Args:
+        model_name (str): The name of the model, without extension.
+        extension (str): The extension of the artifact, e.g. '.pth' or '.safetensors'.
+
+    Returns:
+        str: The path of the artifact.
+    """
+    return os.path.join(os.path.dirname(__file__), '..', '..', 'py_models',
+                        model_name + extension)
+
+
+def _load_model(model_id):
+    """
+    Loads a classification model and its class names from disk.
+
+    Args:
+        model_id (str): The ID of the model to load, a key of MODELS.
+
+    Returns:
+        tuple: A tuple containing the model and the class names.
+    """
+    base_path = os.path.dirname(__file__)
+    model_name, class_names_file = MODELS[model_id]
+
+    with startup_report.measure('model', model_id):
+        weights_path = model_path(model_name, '.safetensors')
+        if os.path.exists(weights_path):
+            model = load_model(weights_path)
+        else:
+            model = torch.load(model_path(model_name, '.pth'),
+                               map_location=torch.device('cpu'), weights_only=False)
+            model.eval()
+
+        class_names_path = os.path.join(base_path, '..', 'classes_json', class_names_file)
+        with open(class_names_path, 'r', encoding='utf-8') as f:
+            class_names = json.load(f)
+
+    return model, class_names
+
 
 def select_model(model_id):
     """
     Select and load a model based on the given model ID.
 
     Args:
-        model_id (str): The ID of the model to load. 
+        model_id (str): The ID of the model to load.
                         "1" loads the 12-seasons model.
                         "2" loads the 4-seasons model.
                         "3" selects the clustering model.
-    
+
     Returns:
         tuple: A tuple containing the model and the class names.
                If the model is 'clustering', returns ('clustering', None).
                If the model_id is invalid, returns (None, None).
     """
-    base_path = os.path.dirname(__file__)
+    if not isinstance(model_id, str):
+        return None, None
 
-    if model_id == "1":
-        model_path = os.path.join(base_path, '..', '..',
-                                  'py_models', 'armocromia_12_seasons_resnet50_full.pth')
-        model = torch.load(model_path, map_location=torch.device('cpu'))
-        model.eval()
+    if model_id in MODELS:
+        with _load_lock:
+            if model_id not in _loaded_models:
+                _loaded_models[model_id] = _load_model(model_id)
+            return _loaded_models[model_id]
 
-        class_names_path = os.path.join(base_path, '..', 'classes_json', 'class_names_12.json')
-        with open(class_names_path, 'r', encoding='utf-8') as f:
-            class_names_12 = json.load(f)
+    if model_id == "3":
+        return "clustering", None
 
-        return model, class_names_12
+    return None, None
 
-    if model_id == "2":
-        model_path = os.path.join(base_path, '..', '..',
-                                  'py_models', 'armocromia_4_seasons_resnet50_full.pth')
-        model = torch.load(model_path, map_location=torch.device('cpu'))
-        model.eval()
 
-        class_names_path = os.path.join(base_path, '..', 'classes_json', 'class_names_4.json')
-        with open(class_names_path, 'r', encoding='utf-8') as f:
-            class_names_4 = json.load(f)
+def preload_models(model_ids):
+    """
+    Loads the given models ahead of the first request.
+    Model "3" imports the clustering stack instead, since its models are built per request.
 
-        return model, class_names_4
+    Args:
+        model_ids (list): The IDs of the models to load.
+    """
+    for model_id in model_ids:
+        try:
+            if model_id == "3":
+                with startup_report.measure('import', 'clustering.clustering'):
+                    # pylint: disable=import-outside-toplevel,unused-import
+                    import clustering.clustering
+                _loaded_models[model_id] = ("clustering", None)
+            else:
+                select_model(model_id)
+        except Exception as e:
+            logging.error("Error while preloading model %s: %s", model_id, e)
 
-    if model_id == "3":
-        return "clustering", None
 
-    return None, None
+def is_model_loaded(model_id):
+    """
+    Checks whether a model is already resident in memory.
+
+    Args:
+        model_id (str): The ID of the model.
+
+    Returns:
+        bool: True if the model has been loaded, otherwise False.
+    """
+    return model_id in _loaded_models
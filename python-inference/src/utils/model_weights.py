@@ -0,0 +1,149 @@
+"""
+Module: model_weights.py
+
+This module provides functions to store model weights as a flat tensor file, using the
+safetensors layout (an 8-byte header length, a JSON header and the raw tensor data), and
+to load them back through a read-only memory map. The tensors of a loaded model point
+directly into the mapped file, so every process on a node shares the same page-cache copy
+of the weights and loading costs little more than mapping the file.
+"""
+
+import json
+import mmap
+import struct
+import torch
+from torch import nn
+from torchvision import models
+
+DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+DTYPE_NAMES = {dtype: name for name, dtype in DTYPES.items()}
+
+ARCHITECTURES = {
+    'resnet50': models.resnet50,
+}
+
+
+def save_weights(state_dict, path, metadata=None):
+    """
+    Writes a state dict to a flat tensor file.
+
+    Args:
+        state_dict (dict): A dictionary mapping tensor names to tensors.
+        path (str): The path of the file to write.
+        metadata (dict): Optional string to string metadata stored in the header.
+    """
+    # Larger elements first, so that every tensor starts at an offset aligned to its type
+    names = sorted(state_dict, key=lambda name: (-state_dict[name].element_size(), name))
+
+    header = {}
+    chunks = []
+    offset = 0
+    for name in names:
+        tensor = state_dict[name].detach().cpu().contiguous()
+        data = tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
+        header[name] = {
+            'dtype': DTYPE_NAMES[tensor.dtype],
+            'shape': list(tensor.shape),
+            'data_offsets': [offset, offset + len(data)]
+        }
+        chunks.append(data)
+        offset += len(data)
+
+    if metadata:
+        header['__metadata__'] = {key: str(value) for key, value in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for data in chunks:
+            f.write(data)
+
+
+def load_weights(path):
+    """
+    Memory-maps a flat tensor file and returns tensors backed by the mapping.
+    The mapping is private, so pages stay shared with the page cache as long as the
+    weights are not modified, which is the case for models in evaluation mode.
+
+    Args:
+        path (str): The path of the file to load.
+
+    Returns:
+        tuple: A tuple containing the state dict and the metadata dictionary.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    header_length = struct.unpack('<Q', mapped[:8])[0]
+    header = json.loads(mapped[8:8 + header_length])
+    metadata = header.pop('__metadata__', {})
+    data_start = 8 + header_length
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        if end == begin:
+            state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+
+        count = (end - begin) // torch.empty(0, dtype=dtype).element_size()
+        tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin)
+        state_dict[name] = tensor.reshape(info['shape'])
+
+    return state_dict, metadata
+
+
+def build_model(metadata, device='cpu'):
+    """
+    Builds an uninitialized model matching the architecture described in the metadata.
+
+    Args:
+        metadata (dict): The metadata stored with the weights, with 'architecture'
+                         and 'num_classes' keys.
+        device (str): The device on which the parameters are allocated. Use 'meta'
+                      to skip the allocation when the weights are assigned afterwards.
+
+    Returns:
+        torch.nn.Module: The model.
+    """
+    architecture = metadata.get('architecture')
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unsupported architecture: {architecture}")
+
+    with torch.device(device):
+        model = ARCHITECTURES[architecture](weights=None)
+        model.fc = nn.Linear(model.fc.in_features, int(metadata['num_classes']))
+
+    return model
+
+
+def load_model(path):
+    """
+    Loads a model from a flat tensor file without copying its weights.
+
+    Args:
+        path (str): The path of the file to load.
+
+    Returns:
+        torch.nn.Module: The model, in evaluation mode.
+    """
+    state_dict, metadata = load_weights(path)
+    model = build_model(metadata, device='meta')
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    return model
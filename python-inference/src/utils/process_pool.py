@@ -0,0 +1,85 @@
+"""
+Module: process_pool.py
+
+This module provides the WorkerPool class, which manages a process pool shared by the
+requests of the server. The pool is created on first use, recreated when the number of
+workers changes, and discarded when one of its workers dies. It also creates the events
+used to cancel the tasks of a request that are already running.
+
+Workers are spawned rather than forked, so they do not inherit the threads of the server
+process. A spawned worker re-imports the main module of the parent: main.py, the entry
+point of the server, imports nothing at module level so that the workers only load the
+modules their tasks need. When server.py is run directly instead, each worker imports it
+again, which is why its startup side effects are guarded by multiprocessing.parent_process().
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class WorkerPool:
+    """
+    WorkerPool class to create, share and discard a pool of spawned worker processes.
+    """
+
+    def __init__(self, initializer=None):
+        """
+        Initializes the WorkerPool, without starting any process.
+
+        Args:
+            initializer (callable): Optional function run once in each worker process,
+                                    called with the number of workers of the pool.
+        """
+        self._initializer = initializer
+        self._pool = None
+        self._workers = 0
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def get(self, workers):
+        """
+        Returns the process pool, creating it on first use or when the number of
+        workers has changed.
+
+        Args:
+            workers (int): The number of worker processes.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        with self._lock:
+            if self._pool is None or self._workers != workers:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=self._initializer,
+                    initargs=(workers,) if self._initializer else ())
+                self._workers = workers
+            return self._pool
+
+    def reset(self, pool):
+        """
+        Discards a broken pool, if it is still the current one, so that the next
+        call to get creates a new one.
+
+        Args:
+            pool (ProcessPoolExecutor): The broken pool.
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+    def create_event(self):
+        """
+        Creates an event that can be passed to the tasks of the pool, starting the manager
+        process that holds the events on first use.
+
+        Returns:
+            multiprocessing.managers.EventProxy: The event, initially unset.
+        """
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context('spawn').Manager()
+            return self._manager.Event()
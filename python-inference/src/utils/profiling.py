@@ -0,0 +1,189 @@
+"""
+Module: profiling.py
+
+This module provides opt-in profiling of single requests. A profiled request is wrapped in
+torch.profiler and/or cProfile and its trace is written to disk, with labelled regions for
+the main processing steps. When no request is being profiled, profile_region returns a
+shared no-op context manager, so the instrumented code pays only a thread-local lookup.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+import torch
+
+logging.basicConfig(level=logging.INFO)
+
+PROFILE_MODES = ('torch', 'cprofile', 'both')
+
+_state = threading.local()
+_null_region = nullcontext()
+# torch.profiler cannot run two profiles at once, so only one request is profiled at a time.
+# It records the operators of the profiled thread only: see is_profiling
+_profile_lock = threading.Lock()
+
+
+def profile_region(name):
+    """
+    Returns a context manager labelling a region of the profiled request.
+
+    Args:
+        name (str): The label of the region, e.g. 'decoding' or 'forward'.
+
+    Returns:
+        contextlib.AbstractContextManager: A torch.profiler.record_function if the current
+                                           thread is being profiled, otherwise a no-op.
+    """
+    if getattr(_state, 'active', False):
+        return torch.profiler.record_function(name)
+    return _null_region
+
+
+def is_profiling():
+    """
+    Checks whether the current thread is being profiled. Work handed to other threads,
+    e.g. the dispatcher of a DynamicBatcher, is missing from the trace, so profiled
+    requests should run it in the current thread instead.
+
+    Returns:
+        bool: True if the current thread is being profiled.
+    """
+    return getattr(_state, 'active', False)
+
+
+def requested_profile_mode(header_value, flag, sample_rate, default_mode):
+    """
+    Decides whether a request is profiled, and how.
+
+    Args:
+        header_value (str or None): The value of the X-Profile header.
+        flag (bool or str or None): The 'profile' field of the request body.
+        sample_rate (float): The fraction of requests profiled when not explicitly requested.
+        default_mode (str): The mode used when profiling is requested without a mode.
+
+    Returns:
+        str or None: One of PROFILE_MODES, or None if the request is not profiled.
+    """
+    for value in (header_value, flag):
+        if isinstance(value, str) and value.lower() in PROFILE_MODES:
+            return value.lower()
+        if value is True or (isinstance(value, str) and value.lower() in ('1', 'true', 'yes')):
+            return default_mode
+
+    if sample_rate > 0 and random.random() < sample_rate:
+        return default_mode
+
+    return None
+
+
+class RequestProfiler:
+    """
+    RequestProfiler class to profile the execution of a single request.
+    """
+
+    def __init__(self, mode, output_dir):
+        """
+        Initializes the RequestProfiler and the paths of its trace files.
+
+        Args:
+            mode (str): One of PROFILE_MODES.
+            output_dir (str): The directory where the traces are written.
+        """
+        self._mode = mode
+        self._output_dir = output_dir
+        self._torch_profiler = None
+        self._cprofile = None
+        self._acquired = False
+        self._written = []
+
+        name = f"predict_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self._chrome_trace_path = os.path.join(output_dir, f"{name}.json")
+        self._pstats_path = os.path.join(output_dir, f"{name}.pstats")
+
+    @property
+    def paths(self):
+        """
+        Returns the paths of the trace files written by this profiler.
+
+        Returns:
+            list: The paths, empty if the profiler could not run or write its traces.
+        """
+        return list(self._written)
+
+    def __enter__(self):
+        self._acquired = _profile_lock.acquire(blocking=False)
+        if not self._acquired:
+            logging.warning("Another request is being profiled, skipping profiling")
+            return self
+
+        try:
+            os.makedirs(self._output_dir, exist_ok=True)
+        except OSError as e:
+            logging.error("Cannot create the profile directory %s, skipping profiling: %s",
+                          self._output_dir, e)
+            _profile_lock.release()
+            self._acquired = False
+            return self
+
+        if self._mode in ('torch', 'both'):
+            self._torch_profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU])
+            self._torch_profiler.__enter__()
+        if self._mode in ('cprofile', 'both'):
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+        _state.active = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._acquired:
+            return False
+
+        _state.active = False
+        try:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+                self._export(self._cprofile.dump_stats, self._pstats_path)
+            if self._torch_profiler is not None:
+                self._torch_profiler.__exit__(exc_type, exc_value, traceback)
+                self._export(self._torch_profiler.export_chrome_trace, self._chrome_trace_path)
+            if self._written:
+                logging.info("Profile written to %s", ', '.join(self._written))
+        except Exception as e:
+            # A failed profile must not discard the response of the request
+            logging.error("Error while stopping the profiler: %s", e)
+        finally:
+            _profile_lock.release()
+
+        return False
+
+    def _export(self, write, path):
+        """
+        Writes a trace file, logging the error instead of raising it.
+
+        Args:
+            write (callable): The function writing the trace to the given path.
+            path (str): The path of the trace file.
+        """
+        try:
+            write(path)
+            self._written.append(path)
+        except Exception as e:
+            logging.error("Error while writing the profile %s: %s", path, e)
+
+
+def default_output_dir():
+    """
+    Returns the default directory for the trace files.
+
+    Returns:
+        str: A directory inside the system temporary directory.
+    """
+    return os.path.join(tempfile.gettempdir(), 'inference-profiles')
@@ -0,0 +1,167 @@
+"""
+Module: result_formatting.py
+
+This module provides the ResultFormatter class which converts the classification results
+into the output format requested by the client.
+"""
+
+import base64
+import mimetypes
+import numpy as np
+
+OUTPUT_FORMATS = ('default', 'compact')
+ENCODINGS = {'json': None, 'float16': '<f2', 'float32': '<f4'}
+
+
+class ResultFormatter:
+    """
+    ResultFormatter class to shape the classification results of each content.
+
+    The 'default' format returns the results exactly as produced by predict_image,
+    optionally truncated to the top-k classes. The 'compact' format lists the class
+    names once and returns, for each content, a probability matrix indexed by
+    image, frame or file, together with the mean probabilities of each video.
+    """
+
+    def __init__(self, class_names, output_format='default', top_k=None, encoding='json'):
+        """
+        Initializes the ResultFormatter with the class names and the output options.
+
+        Args:
+            class_names (dict): A dictionary mapping class indices to class names.
+            output_format (str): Either 'default' or 'compact'.
+            top_k (int or None): Number of most probable classes to keep for each row.
+            encoding (str): Encoding of the compact probability matrices:
+                            'json', 'float16' or 'float32' (base64 of a little-endian buffer).
+        """
+        self._class_names = [class_names[str(i)] for i in range(len(class_names))]
+        self._output_format = output_format
+        self._top_k = top_k
+        self._encoding = encoding
+
+    def format_item(self, filename, file_type, result):
+        """
+        Formats the result of a single content of the request.
+
+        Args:
+            filename (str): The name of the content.
+            file_type (str): The type of the content ('image', 'zip' or 'video').
+            result (list or dict): The result produced by the processing functions.
+
+        Returns:
+            list or dict: The formatted result.
+        """
+        if self._output_format == 'default':
+            return self._truncate(result) if self._top_k else result
+
+        rows = []
+        videos = []
+        if file_type == 'image':
+            rows.append((filename, result))
+        elif file_type == 'video':
+            self._flatten(result, '', rows, videos)
+            videos.append(('', filename))
+        else:
+            self._flatten(result, '', rows, videos)
+
+        labels = [label for label, _ in rows]
+        matrix = np.array([[entry['probability'] for entry in entries] for _, entries in rows],
+                          dtype=np.float64).reshape(len(rows), len(self._class_names))
+
+        compact = {"type": file_type, "items": labels}
+        compact.update(self._encode_rows(matrix))
+
+        if file_type != 'image':
+            compact["aggregates"] = {}
+            for prefix, name in videos:
+                selected = [i for i, label in enumerate(labels) if label.startswith(prefix)]
+                if selected:
+                    mean = np.round(matrix[selected].mean(axis=0), 3).tolist()
+                    compact["aggregates"][name] = mean
+
+        return compact
+
+    def finalize(self, all_results):
+        """
+        Wraps the formatted results of all the contents in the final response.
+
+        Args:
+            all_results (dict): A dictionary mapping content names to formatted results.
+
+        Returns:
+            dict: The response payload.
+        """
+        if self._output_format == 'default':
+            return all_results
+
+        return {
+            "format": self._output_format,
+            "class_names": self._class_names,
+            "encoding": self._encoding,
+            "top_k": self._top_k,
+            "results": all_results
+        }
+
+    def _truncate(self, result):
+        """
+        Keeps only the top-k classes, sorted by probability, in a default-format result.
+
+        Args:
+            result (list or dict): A default-format result.
+
+        Returns:
+            list or dict: The truncated result.
+        """
+        if isinstance(result, list):
+            return sorted(result, key=lambda entry: entry['probability'],
+                          reverse=True)[:self._top_k]
+        return {name: self._truncate(value) for name, value in result.items()}
+
+    def _flatten(self, result, prefix, rows, videos):
+        """
+        Flattens nested video and zip results into labelled probability rows.
+
+        Args:
+            result (dict): A dictionary of results, possibly nested.
+            prefix (str): The path of the result inside the content.
+            rows (list): The list receiving (label, entries) tuples.
+            videos (list): The list receiving (prefix, name) tuples for each nested video.
+        """
+        for name, value in result.items():
+            path = f"{prefix}{name}"
+            if isinstance(value, list):
+                rows.append((path, value))
+                continue
+
+            mime_type, _ = mimetypes.guess_type(name)
+            if mime_type and mime_type.startswith('video'):
+                videos.append((f"{path}/", path))
+            self._flatten(value, f"{path}/", rows, videos)
+
+    def _encode_rows(self, matrix):
+        """
+        Encodes a probability matrix, applying the top-k selection and the encoding.
+
+        Args:
+            matrix (np.ndarray): A (rows, classes) matrix of probabilities.
+
+        Returns:
+            dict: The 'probabilities' entry, plus 'indices' when top-k is requested
+                  and 'shape' when the matrix is base64 encoded.
+        """
+        encoded = {}
+
+        if self._top_k:
+            indices = np.argsort(-matrix, axis=1, kind='stable')[:, :self._top_k]
+            matrix = np.take_along_axis(matrix, indices, axis=1)
+            encoded["indices"] = indices.tolist()
+
+        dtype = ENCODINGS[self._encoding]
+        if dtype is None:
+            encoded["probabilities"] = np.round(matrix, 3).tolist()
+        else:
+            encoded["shape"] = list(matrix.shape)
+            encoded["probabilities"] = base64.b64encode(
+                np.ascontiguousarray(matrix, dtype=dtype).tobytes()).decode('ascii')
+
+        return encoded
@@ -0,0 +1,62 @@
+"""
+Module: startup.py
+
+This module provides the StartupReport class which records how long the server spends
+importing modules and loading models, so that cold starts can be measured.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+
+
+class StartupReport:
+    """
+    StartupReport class to collect the duration of imports and model loads.
+    """
+
+    def __init__(self):
+        """Initializes an empty report, starting the clock at creation time."""
+        self._created_at = time.perf_counter()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, category, name):
+        """
+        Measures the duration of the wrapped block and records it in the report.
+        Only the first measurement of each name is kept, so wrapping an import
+        that is already cached costs nothing in the report.
+
+        Args:
+            category (str): The kind of operation, e.g. 'import' or 'model'.
+            name (str): The name of the module or model.
+        """
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            timings = self._timings.setdefault(category, {})
+            if name not in timings:
+                timings[name] = round(elapsed, 3)
+                logging.info("Startup: %s %s took %.3fs", category, name, elapsed)
+
+    def as_dict(self):
+        """
+        Returns the report as a JSON serializable dictionary.
+
+        Returns:
+            dict: The recorded timings in seconds, grouped by category, and the
+                  time elapsed since the report was created.
+        """
+        with self._lock:
+            report = {category: dict(timings) for category, timings in self._timings.items()}
+        report['uptime'] = round(time.perf_counter() - self._created_at, 3)
+        return report
+
+
+startup_report = StartupReport()
@@ -0,0 +1,316 @@
+"""
+Module: video_decoding.py
+
+This module provides the decoding of video frames, sequentially or in parallel worker
+processes. In parallel mode the video is probed with ffprobe for its frames and keyframes,
+split into keyframe-aligned ranges, and each range is decoded by a worker that seeks to its
+start, so decoding long videos scales with the available cores. Frames are always returned
+in order.
+
+Parallel decoding is enabled by VIDEO_DECODE_WORKERS (> 1) for videos of at least
+VIDEO_PARALLEL_MIN_FRAMES frames, with ranges of about VIDEO_RANGE_FRAMES frames. It needs
+ffprobe, whose timestamps are used to verify the seeks. The decoded ranges are returned
+whole, so the number of ranges in flight is limited to keep their frames within
+VIDEO_DECODE_MEMORY_MB; shorter ranges are used for high resolutions, and videos whose
+keyframes are too far apart for the budget are decoded sequentially.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures.process import BrokenProcessPool
+from .process_pool import WorkerPool
+
+logging.basicConfig(level=logging.INFO)
+
+# Maximum difference in milliseconds between the timestamp of the frame reached by a seek
+# and the expected one
+SEEK_TOLERANCE_MS = 0.5
+# Number of keyframes tried when the seek to the first frame of a range is inaccurate
+SEEK_ATTEMPTS = 3
+
+_pool = WorkerPool()
+
+
+def _seek(video, seek_points):
+    """
+    Seeks a video to the latest seek point whose presentation time can be verified.
+    OpenCV maps times to frame positions with the nominal frame rate, so seeks in videos
+    with a variable frame rate or edit lists can land on another frame: the timestamp of
+    the first frame decoded after a seek is compared with the one reported by ffprobe.
+
+    Args:
+        video (cv2.VideoCapture): The opened video.
+        seek_points (list): (frame index, presentation time in seconds from the start of
+                            the stream) keyframe pairs to try, the latest first.
+
+    Returns:
+        int or None: The number of frames before the next frame of the video, or None if
+                     every seek failed. After a successful seek the keyframe has been
+                     grabbed, and can be retrieved.
+    """
+    import cv2  # pylint: disable=import-outside-toplevel
+
+    for index, presentation_time in seek_points:
+        video.set(cv2.CAP_PROP_POS_MSEC, presentation_time * 1000)
+        if video.grab() and abs(video.get(cv2.CAP_PROP_POS_MSEC)
+                                - presentation_time * 1000) < SEEK_TOLERANCE_MS:
+            return index + 1
+
+    return None
+
+
+def _decode_range(path, start, count, seek_points):
+    """
+    Decodes a range of frames, seeking to a keyframe at or before its first frame and
+    counting the frames decoded from there.
+
+    Args:
+        path (str): The path of the video file.
+        start (int): The index of the first frame.
+        count (int or None): The number of frames, None to decode until the end.
+        seek_points (list): (frame index, presentation time in seconds from the start of
+                            the stream) keyframe pairs at or before start, the latest first.
+                            Empty to decode from the beginning.
+
+    Returns:
+        list or None: The RGB frames of the range, as numpy arrays, or None if no seek
+                      point could be reached accurately.
+    """
+    import cv2  # pylint: disable=import-outside-toplevel
+
+    video = cv2.VideoCapture(path)
+    position = _seek(video, seek_points) if seek_points else 0
+    if position is None:
+        video.release()
+        return None
+
+    frames = []
+    if position == start + 1:
+        # The seek has grabbed the first frame of the range
+        _, frame = video.retrieve()
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    while position < start and video.grab():
+        position += 1
+
+    while count is None or len(frames) < count:
+        ret, frame = video.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    video.release()
+    return frames
+
+
+def probe_video(path):
+    """
+    Probes a video for its frame count and the indices and presentation times of its
+    keyframes. Packets are read with ffprobe, without decoding, and sorted by presentation
+    time; packets discarded by an edit list are not frames of the video. Times are relative
+    to the start time of the stream, like the positions reported by OpenCV.
+
+    Args:
+        path (str): The path of the video file.
+
+    Returns:
+        tuple: A tuple containing the frame count and the sorted (index, presentation time)
+               keyframe pairs, or None if the video cannot be probed.
+    """
+    if not shutil.which('ffprobe'):
+        return None
+
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=start_time:packet=pts_time,flags', '-of', 'json', path],
+            capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output)
+
+        streams = probe.get('streams') or [{}]
+        start_time = streams[0].get('start_time', '0')
+        start_time = float(start_time) if start_time != 'N/A' else 0.0
+
+        packets = []
+        for packet in probe.get('packets', []):
+            flags = packet.get('flags', '')
+            if 'D' not in flags:
+                packets.append((float(packet['pts_time']) - start_time, 'K' in flags))
+        packets.sort()
+
+    except (subprocess.CalledProcessError, ValueError, KeyError) as e:
+        # ValueError and KeyError also cover packets without timestamp, which cannot
+        # be verified
+        logging.error("Error while probing %s with ffprobe: %s", path, e)
+        return None
+
+    keyframes = [(index, pts_time) for index, (pts_time, is_key) in enumerate(packets)
+                 if is_key]
+    return len(packets), keyframes
+
+
+def split_ranges(keyframes, range_frames):
+    """
+    Splits a video into ranges of at least range_frames frames starting on keyframes.
+    The last range always extends to the end of the video.
+
+    Args:
+        keyframes (list): The sorted (index, presentation time) keyframe pairs.
+        range_frames (int): The target number of frames per range.
+
+    Returns:
+        list: A list of (start, count, seek_points) tuples, count being None for the last
+              range and seek_points the keyframes a worker may seek to, the latest first.
+    """
+    starts = [(0, [])]
+    for position, (index, _) in enumerate(keyframes):
+        if index - starts[-1][0] >= range_frames:
+            seek_points = keyframes[max(0, position - SEEK_ATTEMPTS + 1):position + 1]
+            starts.append((index, seek_points[::-1]))
+
+    ranges = [(start, end - start, seek_points)
+              for (start, seek_points), (end, _) in zip(starts, starts[1:])]
+    ranges.append((starts[-1][0], None, starts[-1][1]))
+    return ranges
+
+
+def _decode_sequential(path, skip=0):
+    """
+    Decodes the frames of a video one after the other in the current process.
+
+    Args:
+        path (str): The path of the video file.
+        skip (int): Number of frames to skip from the beginning of the video.
+
+    Yields:
+        numpy.ndarray: The RGB frames, in order.
+    """
+    import cv2  # pylint: disable=import-outside-toplevel
+
+    video = cv2.VideoCapture(path)
+    try:
+        for _ in range(skip):
+            if not video.grab():
+                return
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        video.release()
+
+
+def _decode_parallel(path, ranges, workers, in_flight):
+    """
+    Decodes the ranges of a video in worker processes. At most in_flight ranges are
+    submitted ahead of the one being consumed, and each frame is released once yielded.
+    A range is pickled back from its worker, so while it is transferred its frames are
+    briefly held twice. If a worker cannot seek accurately to its range, the rest of the
+    video is decoded sequentially.
+
+    Args:
+        path (str): The path of the video file.
+        ranges (list): A list of (start, count, seek_points) tuples.
+        workers (int): The number of worker processes.
+        in_flight (int): The maximum number of ranges submitted ahead of the consumer.
+
+    Yields:
+        numpy.ndarray: The RGB frames, in order.
+    """
+    pool = _pool.get(workers)
+    pending = []
+    next_range = 0
+
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < in_flight:
+                start = ranges[next_range][0]
+                pending.append((start, pool.submit(_decode_range, path, *ranges[next_range])))
+                next_range += 1
+
+            start, future = pending.pop(0)
+            try:
+                frames = future.result()
+            except BrokenProcessPool:
+                _pool.reset(pool)
+                raise
+
+            if frames is None:
+                logging.warning("Inaccurate seek at frame %d of %s, decoding the rest "
+                                "sequentially", start, path)
+                for _, queued in pending:
+                    queued.cancel()
+                pending = []
+                yield from _decode_sequential(path, skip=start)
+                return
+
+            frames.reverse()
+            while frames:
+                yield frames.pop()
+    finally:
+        # Stopped early, e.g. by a deadline: drop the ranges not yet decoded
+        for _, queued in pending:
+            queued.cancel()
+
+
+def _frame_bytes(path):
+    """
+    Returns the size of a decoded RGB frame of a video.
+
+    Args:
+        path (str): The path of the video file.
+
+    Returns:
+        int: The size in bytes, 0 if unknown.
+    """
+    import cv2  # pylint: disable=import-outside-toplevel
+
+    video = cv2.VideoCapture(path)
+    width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video.release()
+    return width * height * 3
+
+
+def decode_frames(path):
+    """
+    Decodes the frames of a video, in parallel when enabled, the video is long enough and
+    its ranges fit in the memory budget.
+
+    Args:
+        path (str): The path of the video file.
+
+    Returns:
+        generator: A generator of RGB frames as numpy arrays, in order.
+    """
+    workers = int(os.getenv('VIDEO_DECODE_WORKERS', '0'))
+    probe = probe_video(path) if workers > 1 else None
+    if probe is not None:
+        frame_count, keyframes = probe
+        min_frames = int(os.getenv('VIDEO_PARALLEL_MIN_FRAMES', '300'))
+        range_frames = int(os.getenv('VIDEO_RANGE_FRAMES', '120'))
+        memory = int(os.getenv('VIDEO_DECODE_MEMORY_MB', '2048')) * 1024 * 1024
+        frame_bytes = _frame_bytes(path)
+
+        if frame_count >= min_frames and frame_bytes > 0:
+            # One range per worker in flight and the one being consumed, each counted
+            # twice for the copy made when it is pickled back
+            range_frames = max(1, min(range_frames,
+                                      memory // (frame_bytes * 2 * (workers + 1))))
+            ranges = split_ranges(keyframes, range_frames)
+
+            largest = max((count if count is not None else frame_count - start)
+                          for start, count, _ in ranges) * frame_bytes
+            in_flight = min(workers, memory // (2 * largest) - 1)
+
+            if len(ranges) > 1 and in_flight >= 1:
+                return _decode_parallel(path, ranges, workers, in_flight)
+            if len(ranges) > 1:
+                logging.info("Ranges of %s exceed VIDEO_DECODE_MEMORY_MB, decoding sequentially",
+                             path)
+
+    return _decode_sequential(path)
@@ -2,14 +2,17 @@
 Module: video_processing.py
 
 This module provides functions for video processing and prediction using a pre-trained model.
+Frames are decoded by the video_decoding module, in parallel for long videos when enabled.
+OpenCV is imported on first use, so workers that never receive videos do not load it.
 """
 
 import tempfile
 from PIL import Image
-import cv2
 from .image_processing import predict_image
+from .video_decoding import decode_frames
+from .profiling import profile_region
 
-def process_video(video_data, model, class_names):
+def process_video(video_data, model, class_names, deadline=None):
     """
     Preprocess video frames, make predictions using the specified model,
     and return the probabilities of each class for each frame.
@@ -18,6 +21,8 @@ def process_video(video_data, model, class_names):
         video_data (bytes): Binary video data.
         model (torch.nn.Module): Pre-trained model to use for classification.
         class_names (dict): A dictionary mapping class indices to class names.
+        deadline (Deadline): Optional deadline, checked before each frame. When it expires,
+                             the frames processed so far are returned.
 
     Returns:
         dict: A dictionary containing predictions for each frame of the video.
@@ -28,16 +33,20 @@ def process_video(video_data, model, class_names):
         video_file.write(video_data)
         video_file.flush()
 
-        video = cv2.VideoCapture(video_file.name)
+        frames = decode_frames(video_file.name)
         frame_number = 0
 
         while True:
-            ret, frame = video.read()
-
-            if not ret:
+            if deadline is not None and deadline.expired():
                 break
 
-            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            with profile_region('decoding'):
+                frame = next(frames, None)
+
+                if frame is None:
+                    break
+
+                image = Image.fromarray(frame)
 
             if model == 'clustering':
                 results.append([f"frame_{frame_number}", image])
@@ -47,6 +56,7 @@ def process_video(video_data, model, class_names):
 
             frame_number += 1
 
-        video.release()
+        # Stops the decoding workers if the loop ended early
+        frames.close()
 
     return results
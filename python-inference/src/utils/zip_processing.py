@@ -4,11 +4,12 @@ from io import BytesIO
 from PIL import Image, UnidentifiedImageError
 from .image_processing import predict_image
 from utils.video_processing import process_video
+from utils.profiling import profile_region
 import mimetypes
 
 logging.basicConfig(level=logging.INFO)
 
-def process_zip(zip_data, model, class_names):
+def process_zip(zip_data, model, class_names, deadline=None):
     """
     Extracts images and videos from a binary ZIP file, including nested ZIP files, 
     and makes predictions using the specified model.
@@ -17,6 +18,8 @@ def process_zip(zip_data, model, class_names):
         zip_data (bytes): Binary ZIP file data.
         model (torch.nn.Module or str): Pre-trained model to use for classification or 'clustering'.
         class_names (dict): A dictionary mapping class indices to class names.
+        deadline (Deadline): Optional deadline, checked before each file. When it expires,
+                             the files processed so far are returned.
 
     Returns:
         dict or list: A dictionary containing predictions for 
@@ -27,9 +30,13 @@ def process_zip(zip_data, model, class_names):
 
     with zipfile.ZipFile(BytesIO(zip_data), 'r') as zip_file:
         for filename_zip in zip_file.namelist():
+            if deadline is not None and deadline.expired():
+                break
+
             with zip_file.open(filename_zip) as file_in_zip:
                 # Explicitly read file data
-                file_data = file_in_zip.read()
+                with profile_region('decoding'):
+                    file_data = file_in_zip.read()
 
                 # Determine file type based on extension
                 mime_type, _ = mimetypes.guess_type(filename_zip)
@@ -40,12 +47,12 @@ def process_zip(zip_data, model, class_names):
                     # Use BytesIO to create a stream-like object
                     file_stream = bytes(file_data)
                     if model == 'clustering':
-                        video_results = process_video(file_stream, model, class_names)
+                        video_results = process_video(file_stream, model, class_names, deadline)
                         results.extend([[f"{file_zip_splitted}/{name}", img] for name,
                                         img in video_results])
                     else:
-                        results[file_zip_splitted] = process_video(file_stream,
-                                                                   model, class_names)
+                        results[file_zip_splitted] = process_video(file_stream, model,
+                                                                   class_names, deadline)
 
                 elif mime_type and mime_type.startswith('image'):
                     # Check if the image type is JPEG or PNG
@@ -64,7 +71,7 @@ def process_zip(zip_data, model, class_names):
 
                 elif mime_type and mime_type == 'application/zip':
                     # Process nested zip files
-                    nested_results = process_zip(file_data, model, class_names)
+                    nested_results = process_zip(file_data, model, class_names, deadline)
                     if model == 'clustering':
                         results.extend([f"{file_zip_splitted}/{name}", img] for name,
                                         img in nested_results)